@@ -17,10 +17,15 @@ Outputs:
 import os
 import glob
 import yaml
+from concurrent.futures import ThreadPoolExecutor
 import rasterio
-from rasterio import mask
+from rasterio.errors import WindowError
+from rasterio.features import geometry_mask, geometry_window
 from rasterio.merge import merge
+import numpy as np
+import shapely
 from shapely.geometry import mapping
+from pyproj import Transformer
 import geopandas as gpd
 
 
@@ -52,9 +57,15 @@ def reproject_aoi(aoi_path: str, reference_raster: str):
         target_crs = src.crs
 
     gdf = gpd.read_file(aoi_path)
-    gdf = gdf.to_crs(target_crs)
 
-    return [mapping(geom) for geom in gdf.geometry]
+    # Transform all vertices in one vectorized call instead of going through to_crs
+    transformer = Transformer.from_crs(gdf.crs, target_crs, always_xy=True)
+    geoms = shapely.transform(
+        gdf.geometry.values,
+        lambda xy: np.column_stack(transformer.transform(xy[:, 0], xy[:, 1]))
+    )
+
+    return [mapping(geom) for geom in geoms]
 
 
 # ================== RASTER CLIPPING ==================
@@ -69,7 +80,7 @@ def clip_raster_to_aoi(raster_path: str, aoi_geom: list, clipped_dir: str):
     aoi_geom : list
         AOI geometry (in same CRS as raster).
     clipped_dir : str
-        Output directory for clipped rasters.
+        Output directory for clipped rasters (must already exist).
 
     Returns
     -------
@@ -81,21 +92,32 @@ def clip_raster_to_aoi(raster_path: str, aoi_geom: list, clipped_dir: str):
 
     with rasterio.open(raster_path) as src:
         try:
-            out_image, out_transform = mask.mask(src, aoi_geom, crop=True)
-        except ValueError:
+            window = geometry_window(src, aoi_geom)
+        except WindowError:
             # Raised if AOI and raster do not overlap
             print(f"Skipped (no intersection): {filename}")
             return None
 
+        # Read only the AOI bounding window, then blank pixels outside the AOI
+        out_image = src.read(window=window)
+        out_transform = src.window_transform(window)
+        outside = geometry_mask(aoi_geom, out_shape=out_image.shape[1:], transform=out_transform)
+        out_image[:, outside] = src.nodata if src.nodata is not None else 0
+
         out_meta = src.meta.copy()
         out_meta.update({
             "driver": "GTiff",
             "height": out_image.shape[1],
             "width": out_image.shape[2],
-            "transform": out_transform
+            "transform": out_transform,
+            "compress": "lzw",
+            "predictor": 2,
+            "tiled": True,
+            "blockxsize": 512,
+            "blockysize": 512,
+            "BIGTIFF": "IF_SAFER"
         })
 
-        os.makedirs(clipped_dir, exist_ok=True)
         with rasterio.open(out_path, "w", **out_meta) as dest:
             dest.write(out_image)
 
@@ -119,23 +141,16 @@ def create_mosaic(clipped_files: list, output_path: str):
         print("No clipped files found — mosaic skipped.")
         return
 
-    src_files = [rasterio.open(fp) for fp in clipped_files]
-    mosaic, out_trans = merge(src_files)
-
-    out_meta = src_files[0].meta.copy()
-    out_meta.update({
-        "driver": "GTiff",
-        "height": mosaic.shape[1],
-        "width": mosaic.shape[2],
-        "transform": out_trans
-    })
-
     os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
-    with rasterio.open(output_path, "w", **out_meta) as dest:
-        dest.write(mosaic)
-
-    for src in src_files:
-        src.close()
+    # Let merge write the mosaic itself instead of returning it as an array
+    merge(clipped_files, dst_path=output_path, dst_kwds={
+        "compress": "lzw",
+        "predictor": 2,
+        "tiled": True,
+        "blockxsize": 512,
+        "blockysize": 512,
+        "BIGTIFF": "IF_SAFER"
+    })
 
     print(f"Mosaic created: {output_path}")
 
@@ -159,12 +174,12 @@ def main():
     # Reproject AOI
     aoi_geom = reproject_aoi(aoi_path, tiff_files[0])
 
-    # Clip each raster
-    clipped_files = []
-    for tif in tiff_files:
-        result = clip_raster_to_aoi(tif, aoi_geom, clipped_dir)
-        if result:
-            clipped_files.append(result)
+    # Clip each raster; rasterio releases the GIL during GDAL I/O so the
+    # tiles overlap. Results keep input order so the mosaic is deterministic.
+    os.makedirs(clipped_dir, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=min(8, len(tiff_files))) as ex:
+        futures = [ex.submit(clip_raster_to_aoi, tif, aoi_geom, clipped_dir) for tif in tiff_files]
+        clipped_files = [f.result() for f in futures if f.result()]
 
     # Create mosaic
     if clipped_files:
@@ -7,21 +7,42 @@ Description:
 This script computes three vegetation indices (NDVI, GNDVI, and EVI2) from a
 stacked Sentinel-2 raster (bands: B02, B03, B04, B08).
 
-It saves each index as an individual GeoTIFF file in the configured output
-directory.
+It saves the indices as bands of a single GeoTIFF file in the configured
+output directory.
 
 
 Outputs:
 --------
-  - NDVI.tif
-  - GNDVI.tif
-  - EVI2.tif
+  - indices.tif (band 1: NDVI, band 2: GNDVI, band 3: EVI2)
 """
 
 import os
 import yaml
 import rasterio
 import numpy as np
+import numexpr as ne
+
+
+# =================== INDEX EXPRESSIONS ===================
+# Each index is clipped to [-1, 1] inside the same fused expression
+INDEX_EXPRESSIONS = {
+    "NDVI": "(nir - red) / (nir + red)",
+    "GNDVI": "(nir - green) / (nir + green)",
+    "EVI2": "evi2_g * (nir - red) / (nir + evi2_c * red + 1)",
+}
+
+# Float constants are passed as float32 scalars; numexpr widens float
+# literals to float64, which would upcast the whole result
+INDEX_CONSTANTS = {
+    "evi2_g": np.float32(2.5),
+    "evi2_c": np.float32(2.4),
+}
+
+
+def compute_index(name: str, bands: dict) -> np.ndarray:
+    """Evaluate a vegetation index and its [-1, 1] clip in a single numexpr pass."""
+    x = INDEX_EXPRESSIONS[name]
+    return ne.evaluate(f"where({x} < -1, -1, where({x} > 1, 1, {x}))", local_dict={**INDEX_CONSTANTS, **bands})
 
 
 # =================== CONFIG LOADER ===================
@@ -41,45 +62,36 @@ def calculate_indices(input_tif: str, output_dir: str):
     input_tif : str
         Path to input raster (stacked or mosaicked image containing B02, B03, B04, B08).
     output_dir : str
-        Directory to save the resulting index rasters.
+        Directory to save the resulting index raster.
+
+    Returns
+    -------
+    str
+        Path to the 3-band index raster (NDVI, GNDVI, EVI2).
     """
     os.makedirs(output_dir, exist_ok=True)
+    out_path = os.path.join(output_dir, "indices.tif")
 
     with rasterio.open(input_tif) as src:
-        # Read spectral bands
-        blue = src.read(1).astype("float32")   # B02
-        green = src.read(2).astype("float32")  # B03
-        red = src.read(3).astype("float32")    # B04
-        nir = src.read(4).astype("float32")    # B08
-
-        np.seterr(divide="ignore", invalid="ignore")
+        meta = src.meta.copy()
+        # predictor=3 is floating-point differencing for the float32 indices
+        meta.update(driver="GTiff", dtype=rasterio.float32, count=len(INDEX_EXPRESSIONS), compress="lzw",
+                    predictor=3, tiled=True, blockxsize=512, blockysize=512, BIGTIFF="IF_SAFER")
 
-        # ========== NDVI ==========
-        ndvi = (nir - red) / (nir + red)
-        ndvi = np.clip(ndvi, -1, 1)
+        with rasterio.open(out_path, "w", **meta) as dst:
+            dst.descriptions = tuple(INDEX_EXPRESSIONS)
 
-        # ========== GNDVI ==========
-        gndvi = (nir - green) / (nir + green)
-        gndvi = np.clip(gndvi, -1, 1)
+            # Iterate over the output tile grid so each write fills whole blocks
+            for _, win in dst.block_windows(1):
+                # Read spectral bands (B02 is not used by any index)
+                green, red, nir = src.read([2, 3, 4], window=win).astype("float32")  # B03, B04, B08
+                bands = {"green": green, "red": red, "nir": nir}
 
-        # ========== EVI2 ==========
-        evi2 = 2.5 * (nir - red) / (nir + 2.4 * red + 1)
-        evi2 = np.clip(evi2, -1, 1)
+                for i, name in enumerate(INDEX_EXPRESSIONS, start=1):
+                    dst.write(compute_index(name, bands), i, window=win)
 
-        # ========== Save Outputs ==========
-        meta = src.meta.copy()
-        meta.update(driver="GTiff", dtype=rasterio.float32, count=1, compress="lzw")
-
-        def save_raster(array: np.ndarray, name: str):
-            """Write index array to GeoTIFF."""
-            out_path = os.path.join(output_dir, f"{name}.tif")
-            with rasterio.open(out_path, "w", **meta) as dst:
-                dst.write(array, 1)
-            print(f"Saved {name}: {out_path}")
-
-        save_raster(ndvi, "NDVI")
-        save_raster(gndvi, "GNDVI")
-        save_raster(evi2, "EVI2")
+    print(f"Saved {', '.join(INDEX_EXPRESSIONS)}: {out_path}")
+    return out_path
 
 
 # =================== MAIN ===================
@@ -8,7 +8,7 @@ import os
 import yaml
 import datetime
 import glob
-import geopandas as gpd
+import pyogrio
 import rasterio
 
 def load_config(config_path="config.yaml"):
@@ -32,12 +32,16 @@ def summarize_raster(raster_path):
 
 def summarize_vector(vector_path):
     try:
-        gdf = gpd.read_file(vector_path)
-        total_area = gdf["area_ha"].sum() if "area_ha" in gdf.columns else None
+        # Layer metadata plus the area_ha column only; geometries are never decoded
+        info = pyogrio.read_info(vector_path)
+        total_area = None
+        if "area_ha" in info["fields"]:
+            areas = pyogrio.read_dataframe(vector_path, columns=["area_ha"], read_geometry=False)["area_ha"]
+            total_area = float(areas.sum())
         return {
-            "Features": len(gdf),
+            "Features": info["features"],
             "Total Area (ha)": round(total_area, 2) if total_area else "N/A",
-            "CRS": str(gdf.crs)
+            "CRS": str(info["crs"])
         }
     except Exception as e:
         return {"Error": str(e)}
@@ -63,11 +67,10 @@ def generate_report(config_path="config.yaml", output_dir="outputs"):
     # --- Processed Rasters ---
     report_lines.append("RASTER SUMMARY")
     report_lines.append("-" * 20)
-    for name in ["NDVI", "GNDVI", "EVI2"]:
-        path = os.path.join(output_dir, "indices", f"{name}.tif")
-        if os.path.exists(path):
-            info = summarize_raster(path)
-            report_lines.append(f"{name}.tif → {info}")
+    path = os.path.join(output_dir, "indices", "indices.tif")
+    if os.path.exists(path):
+        info = summarize_raster(path)
+        report_lines.append(f"indices.tif (NDVI, GNDVI, EVI2) → {info}")
     report_lines.append("")
 
     # --- Vector outputs ---
@@ -5,12 +5,19 @@ Saves vectors in GPKG and computes area in hectares.
 """
 
 import os
+import math
 import yaml
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 import numpy as np
+import numexpr as ne
+import cv2
+from numba import njit, prange
 import rasterio
 from rasterio.features import shapes
 from shapely.geometry import shape
 import geopandas as gpd
+import pyogrio
 from scipy import ndimage as ndi
 from pyproj import CRS
 
@@ -20,13 +27,16 @@ def load_config(config_path="config.yaml"):
         return yaml.safe_load(f)
 
 
-def read_raster(path):
+def read_indices(path):
+    # Bands are written in NDVI, GNDVI, EVI2 order by compute_indices
     with rasterio.open(path) as src:
-        arr = src.read(1).astype("float32")
+        ndvi, gndvi, evi2 = src.read([1, 2, 3], out_dtype="float32")
         meta = src.meta.copy()
-    return arr, meta
+    return ndvi, gndvi, evi2, meta
 
 
+# Cached: the same few radii are requested for every morphology call
+@lru_cache(maxsize=8)
 def disk(radius):
     L = 2 * radius + 1
     y, x = np.ogrid[:L, :L]
@@ -34,11 +44,16 @@ def disk(radius):
 
 
 def binary_morphology(mask, open_radius=1, close_radius=1):
-    out = mask.copy().astype(np.uint8)
+    # cv2 returns new arrays, so the input only needs a uint8 view, not a copy.
+    # disk() is used rather than cv2.MORPH_ELLIPSE, which differs for radius >= 2,
+    # and pixels outside the raster count as 0, as in scipy.ndimage.
+    out = mask.view(np.uint8) if mask.dtype == np.bool_ else np.ascontiguousarray(mask, dtype=np.uint8)
     if open_radius > 0:
-        out = ndi.binary_opening(out, structure=disk(open_radius))
+        out = cv2.morphologyEx(out, cv2.MORPH_OPEN, disk(open_radius),
+                               borderType=cv2.BORDER_CONSTANT, borderValue=0)
     if close_radius > 0:
-        out = ndi.binary_closing(out, structure=disk(close_radius))
+        out = cv2.morphologyEx(out, cv2.MORPH_CLOSE, disk(close_radius),
+                               borderType=cv2.BORDER_CONSTANT, borderValue=0)
     return out
 
 
@@ -54,28 +69,40 @@ def compute_area_ha(gdf):
     if gdf.empty:
         gdf["area_ha"] = []
         return gdf
-    crs = gdf.crs
-    if CRS(crs).is_geographic:
-        gdf_proj = gdf.to_crs(gdf.estimate_utm_crs())
+    # Reproject only the geometry column, not the whole GeoDataFrame
+    if CRS(gdf.crs).is_geographic:
+        gdf["area_ha"] = gdf.geometry.to_crs(gdf.estimate_utm_crs()).area / 10000.0
     else:
-        gdf_proj = gdf
-    gdf["area_ha"] = gdf_proj.geometry.area / 10000.0
+        gdf["area_ha"] = gdf.geometry.area / 10000.0
     return gdf
 
 
-def process_index_to_vectors(name, arr, meta, val_range, proc, out_dir, fmt="GPKG"):
-    mask = (arr >= val_range[0]) & (arr <= val_range[1])
-    mask = binary_morphology(mask, proc["morph_open_radius"], proc["morph_close_radius"])
+def filter_regions(mask, min_pixels, max_pixels):
+    # Drop components outside the size range before they reach shapes()/GEOS
+    labeled, _ = ndi.label(mask)
+    sizes = np.bincount(labeled.ravel())
+    keep = ((sizes >= min_pixels) & (sizes <= max_pixels)).astype(np.uint8)
+    keep[0] = 0
+    return keep[labeled]
 
-    labeled, n = ndi.label(mask)
-    pixel_area_m2 = abs(meta["transform"].a) * abs(meta["transform"].e)
-    min_pixels = int((proc["min_area_ha"] * 10000) / pixel_area_m2)
 
-    clean = np.zeros_like(mask, dtype=np.uint8)
-    for i in range(1, n + 1):
-        region = (labeled == i)
-        if region.sum() >= min_pixels:
-            clean[region] = 1
+@njit(parallel=True, cache=True)
+def combined_range_mask(ndvi, gndvi, evi2, lo1, hi1, lo2, hi2, lo3, hi3, out):
+    # One fused pass over the three indices; no fastmath, NaN pixels must compare False
+    for i in prange(ndvi.shape[0]):
+        for j in range(ndvi.shape[1]):
+            a = ndvi[i, j]
+            b = gndvi[i, j]
+            c = evi2[i, j]
+            out[i, j] = (lo1 <= a <= hi1) and (lo2 <= b <= hi2) and (lo3 <= c <= hi3)
+
+
+def process_index_to_vectors(name, arr, meta, val_range, pixel_range, proc, out_dir, fmt="GPKG"):
+    lo, hi = val_range
+    mask = ne.evaluate("(arr >= lo) & (arr <= hi)")
+    mask = binary_morphology(mask, proc["morph_open_radius"], proc["morph_close_radius"])
+
+    clean = filter_regions(mask, *pixel_range)
 
     gdf = raster_to_polygons(clean, meta)
     gdf = compute_area_ha(gdf)
@@ -88,51 +115,61 @@ def process_index_to_vectors(name, arr, meta, val_range, proc, out_dir, fmt="GPK
     out_name = f"{name}_polygons.gpkg" if fmt == "GPKG" else f"{name}_polygons.shp"
     out_path = os.path.join(out_dir, out_name)
     driver = "GPKG" if fmt == "GPKG" else "ESRI Shapefile"
-    gdf.to_file(out_path, driver=driver)
+    pyogrio.write_dataframe(gdf, out_path, driver=driver)
     return out_path, gdf
 
 
+def _index_to_vector_path(name, indices_path, band, val_range, pixel_range, proc, out_dir, fmt):
+    # Pool worker: read its own band rather than receiving a pickled copy, and
+    # return only the output path so the GeoDataFrame is not pickled back
+    with rasterio.open(indices_path) as src:
+        arr = src.read(band, out_dtype="float32")
+        meta = src.meta.copy()
+    res = process_index_to_vectors(name, arr, meta, val_range, pixel_range, proc, out_dir, fmt)
+    return res[0] if res else None
+
+
 def run(config_path="config.yaml"):
     cfg = load_config(config_path)
-    ndvi_path = cfg["paths"].get("ndvi") or os.path.join(cfg["paths"]["output_dir"], "indices", "NDVI.tif")
-    gndvi_path = cfg["paths"].get("gndvi") or os.path.join(cfg["paths"]["output_dir"],  "indices", "GNDVI.tif")
-    evi2_path = cfg["paths"].get("evi2") or os.path.join(cfg["paths"]["output_dir"], "indices", "EVI2.tif")
+    indices_path = cfg["paths"].get("indices") or os.path.join(cfg["paths"]["output_dir"], "indices", "indices.tif")
 
     proc = cfg["processing"]
     outdir = os.path.join(cfg["paths"]["output_dir"], "polygons")
     fmt = cfg["output"].get("vector_format", "GPKG").upper()
 
-    ndvi, meta = read_raster(ndvi_path)
-    gndvi, _ = read_raster(gndvi_path)
-    evi2, _ = read_raster(evi2_path)
-
-    results = {}
-    ndvi_res = process_index_to_vectors("NDVI", ndvi, meta, proc["ndvi_range"], proc, outdir, fmt)
-    if ndvi_res:
-        results["NDVI"] = ndvi_res[0]
-
-    gndvi_res = process_index_to_vectors("GNDVI", gndvi, meta, proc["gndvi_range"], proc, outdir, fmt)
-    if gndvi_res:
-        results["GNDVI"] = gndvi_res[0]
+    with rasterio.open(indices_path) as src:
+        transform = src.transform
 
-    evi2_res = process_index_to_vectors("EVI2", evi2, meta, proc["evi2_range"], proc, outdir, fmt)
-    if evi2_res:
-        results["EVI2"] = evi2_res[0]
+    # Area limits in pixels are the same for every index and the combined mask
+    pixel_area_m2 = abs(transform.a) * abs(transform.e)
+    min_pixels = int((proc["min_area_ha"] * 10000) / pixel_area_m2)
+    # Round up: this is only a prefilter, the area_ha check below stays exact
+    max_pixels = math.ceil((proc["max_area_ha"] * 10000) / pixel_area_m2)
+
+    # The three indices are independent and CPU-bound, so run them in parallel;
+    # bands are written in NDVI, GNDVI, EVI2 order by compute_indices
+    tasks = {
+        "NDVI": (1, proc["ndvi_range"]),
+        "GNDVI": (2, proc["gndvi_range"]),
+        "EVI2": (3, proc["evi2_range"]),
+    }
+    with ProcessPoolExecutor(max_workers=len(tasks)) as ex:
+        futures = {name: ex.submit(_index_to_vector_path, name, indices_path, band, val_range,
+                                     (min_pixels, max_pixels), proc, outdir, fmt)
+                   for name, (band, val_range) in tasks.items()}
+        outputs = {name: f.result() for name, f in futures.items()}
+
+    results = {name: out_path for name, out_path in outputs.items() if out_path}
+
+    # Combined intersection, built once the workers are done so the parallel
+    # kernel does not compete with them for cores or memory
+    ndvi, gndvi, evi2, meta = read_indices(indices_path)
+    combined = np.empty(ndvi.shape, dtype=np.uint8)
+    combined_range_mask(ndvi, gndvi, evi2, *proc["ndvi_range"], *proc["gndvi_range"], *proc["evi2_range"], combined)
+    del ndvi, gndvi, evi2
 
-    # Combined intersection
-    combined = ((ndvi >= proc["ndvi_range"][0]) & (ndvi <= proc["ndvi_range"][1]) &
-                (gndvi >= proc["gndvi_range"][0]) & (gndvi <= proc["gndvi_range"][1]) &
-                (evi2 >= proc["evi2_range"][0]) & (evi2 <= proc["evi2_range"][1])).astype(np.uint8)
     combined = binary_morphology(combined, proc["morph_open_radius"], proc["morph_close_radius"])
-
-    labeled, n = ndi.label(combined)
-    pixel_area_m2 = abs(meta["transform"].a) * abs(meta["transform"].e)
-    min_pixels = int((proc["min_area_ha"] * 10000) / pixel_area_m2)
-    final_mask = np.zeros_like(combined, dtype=np.uint8)
-    for i in range(1, n + 1):
-        region = (labeled == i)
-        if region.sum() >= min_pixels:
-            final_mask[region] = 1
+    final_mask = filter_regions(combined, min_pixels, max_pixels)
 
     palm_gdf = raster_to_polygons(final_mask, meta)
     palm_gdf = compute_area_ha(palm_gdf)
@@ -145,7 +182,7 @@ def run(config_path="config.yaml"):
     palm_name = "Palm_Combined.gpkg" if fmt == "GPKG" else "Palm_Combined.shp"
     palm_path = os.path.join(outdir, palm_name)
     driver = "GPKG" if fmt == "GPKG" else "ESRI Shapefile"
-    palm_gdf.to_file(palm_path, driver=driver)
+    pyogrio.write_dataframe(palm_gdf, palm_path, driver=driver)
     results["Palm_Combined"] = palm_path
     return results
 if __name__ == "__main__":
@@ -5,8 +5,9 @@ unzip_stack.py — Sentinel-2 L2A extraction and band stacking utility
 Description:
 ------------
 This script automates the process of:
-  1. Unzipping Sentinel-2 L2A .zip archives.
-  2. Extracting specified 10 m resolution bands (e.g., B02, B03, B04, B08).
+  1. Unzipping the specified 10 m resolution bands (e.g., B02, B03, B04, B08)
+     from Sentinel-2 L2A .zip archives.
+  2. Locating the extracted band files.
   3. Stacking them into a single GeoTIFF file.
 
 Outputs:
@@ -47,19 +48,11 @@ def find_bands(folder: str, bands: list) -> list:
     list
         Ordered list of JP2 file paths matching requested bands.
     """
-    found = {b: None for b in bands}
-
-    for root, _, files in os.walk(folder):
-        root_up = root.upper()
-        for f in files:
-            if not f.lower().endswith(".jp2"):
-                continue
-            fname_up = f.upper()
-            for b in bands:
-                # Sentinel-2 stores 10 m resolution bands under R10m folder
-                if b in fname_up and ("R10M" in root_up or "10M" in fname_up):
-                    if found[b] is None:
-                        found[b] = os.path.join(root, f)
+    # SAFE layout is fixed: [<product>.SAFE/]GRANULE/<granule>/IMG_DATA/R10m/*_Bxx_10m.jp2
+    r10m = os.path.join("GRANULE", "*", "IMG_DATA", "R10m", "*_B??_10m.jp2")
+    matches = glob.glob(os.path.join(folder, r10m)) + glob.glob(os.path.join(folder, "*", r10m))
+
+    found = {b: next((m for m in matches if f"_{b}_10m" in os.path.basename(m)), None) for b in bands}
 
     # Check if all required bands were found
     missing = [b for b, path in found.items() if path is None]
@@ -89,36 +82,44 @@ def stack_bands(jp2_files: list, output_tif: str):
     crs = ref.crs
     transform = ref.transform
 
-    arrays = [s.read(1) for s in srcs]
-
     meta = {
         "driver": "GTiff",
         "height": height,
         "width": width,
-        "count": len(arrays),
+        "count": len(srcs),
         "crs": crs,
         "transform": transform,
         "dtype": rasterio.uint16,
-        "compress": "lzw"
+        "compress": "lzw",
+        "predictor": 2,
+        "tiled": True,
+        "blockxsize": 512,
+        "blockysize": 512,
+        "BIGTIFF": "IF_SAFER"
     }
 
     os.makedirs(os.path.dirname(output_tif), exist_ok=True)
 
+    # Copy one band at a time so only a single band is held in memory
     with rio_open(output_tif, "w", **meta) as dst:
-        for i, arr in enumerate(arrays, start=1):
-            dst.write(arr.astype(rasterio.uint16), i)
+        for i, s in enumerate(srcs, start=1):
+            dst.write(s.read(1), i)
 
     for s in srcs:
         s.close()
 
-    print(f"Stacked {len(arrays)} bands → {output_tif}")
+    print(f"Stacked {len(srcs)} bands → {output_tif}")
 
 
 # ================== ZIP EXTRACTION ==================
-def unzip_file(zip_path: str, extract_dir: str):
-    """Extract all contents from a Sentinel-2 ZIP archive."""
+def unzip_file(zip_path: str, extract_dir: str, bands: list):
+    """Extract only the requested 10 m JP2 bands from a Sentinel-2 ZIP archive."""
+    wanted_patterns = tuple(f"_{b.upper()}_10M" for b in bands)
     with zipfile.ZipFile(zip_path, 'r') as z:
-        z.extractall(extract_dir)
+        for info in z.infolist():
+            name_up = info.filename.upper()
+            if name_up.endswith(".JP2") and any(p in name_up for p in wanted_patterns):
+                z.extract(info, extract_dir)
 
 
 # ================== MAIN PIPELINE ==================
@@ -140,7 +141,7 @@ def main():
         temp_dir = os.path.join(output_dir, f"temp_{idx}")
         os.makedirs(temp_dir, exist_ok=True)
 
-        unzip_file(zip_path, temp_dir)
+        unzip_file(zip_path, temp_dir, bands)
 
         try:
             jp2_files = find_bands(temp_dir, bands)